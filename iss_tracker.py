@@ -2,18 +2,138 @@
 
 from geopy.geocoders import Nominatim
 from flask import Flask, request
-import time
+from flask.json.provider import JSONProvider
+from lxml import etree
+from numba import njit, prange
+from requests.adapters import HTTPAdapter, Retry
+import calendar
+import diskcache
+import functools
 import math
+import orjson
+import threading
+import time
+import numpy as np
 import requests
-import xmltodict
 import yaml
 
+class ORJSONProvider(JSONProvider):
+    '''
+    JSON provider backed by orjson, which encodes in native code roughly 5-10x faster
+    than the stdlib encoder. This matters most for `/`, where serializing the whole
+    nested OEM dict dominates the response time. OPT_SERIALIZE_NUMPY lets route
+    handlers return NumPy scalars and arrays directly.
+    '''
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
+OEM_URL = 'https://nasa-public-data.s3.amazonaws.com/iss-coords/current/ISS_OEM/ISS.OEM_J2K_EPH.xml'
+# Bump whenever the shape of the cached parse result changes, so entries written
+# by an older revision of the code can never be loaded into the new layout.
+OEM_CACHE_VERSION = 2
+cache = diskcache.Cache('.iss_cache')
+# One pooled session for the S3 fetches: repeated /post-data calls reuse the
+# TCP+TLS connection instead of paying a fresh handshake, and transient 5xx
+# responses are retried with backoff at the adapter level.
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504))))
 data = {}
+meta = {}
+EPOCHS = []
+XYZ = np.empty((0, 3))
+VXYZ = np.empty((0, 3))
+EPOCH_TS = np.empty(0)
+SPEED = np.empty(0)
+LAT = np.empty(0)
+LON = np.empty(0)
+ALT = np.empty(0)
+_EPOCH_INDEX = {}
+_OEM_JSON_BYTES = None
+_geocoder = Nominatim(user_agent='iss_tracker', timeout=5)
+# Serializes (re)loads and deletes of the module-level data set so concurrent
+# requests under a threaded WSGI server never observe a half-built state.
+_DATA_LOCK = threading.RLock()
 MEAN_EARTH_RADIUS = 6371.0
 
 # ---------------------------- Methods ---------------------------------
 
+def _attrs(el) -> dict:
+    '''
+    Given an lxml element, function returns its attributes as an xmltodict-style dict
+    (`@name` keys), translating Clark-notation namespaced names back to their prefixed form.
+    Args:
+        el (etree._Element): Element whose attributes to convert.
+    Returns:
+        result (dict): Attribute mapping with `@`-prefixed keys.
+    '''
+    out = {}
+    for name, value in el.attrib.items():
+        if name.startswith('{'):
+            uri, _, local = name[1:].partition('}')
+            prefix = next((p for p, u in (el.nsmap or {}).items() if u == uri and p), None)
+            name = f'{prefix}:{local}' if prefix else local
+        out['@' + name] = value
+    return out
+
+def _parse_oem(stream) -> tuple:
+    '''
+    Function parses the OEM document from a file-like object in a single iterparse pass.
+    State vectors are appended straight to flat columns and their elements freed
+    immediately, so memory stays constant however large the file grows; the small
+    header/metadata/COMMENT subtrees become an xmltodict-shaped document skeleton.
+    Args:
+        stream: File-like object yielding the OEM XML bytes.
+    Returns:
+        result (tuple): (skeleton dict, epochs list, XYZ array, VXYZ array).
+    '''
+    epochs = []
+    xyz = []
+    vxyz = []
+    comments = []
+    header = {}
+    metadata = {}
+    root = None
+    oem_attrs = {}
+    for event, el in etree.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = el
+            elif el.tag == 'oem':
+                oem_attrs = _attrs(el)
+            continue
+        if el.tag == 'stateVector':
+            epochs.append(el.findtext('EPOCH'))
+            xyz.append((float(el.findtext('X')), float(el.findtext('Y')), float(el.findtext('Z'))))
+            vxyz.append((float(el.findtext('X_DOT')), float(el.findtext('Y_DOT')), float(el.findtext('Z_DOT'))))
+            el.clear(keep_tail=True)
+            parent = el.getparent()
+            while el.getprevious() is not None:
+                del parent[0]
+        elif el.tag == 'COMMENT' and el.getparent().tag == 'data':
+            comments.append(el.text)
+        elif el.tag == 'header':
+            header = {child.tag: child.text for child in el}
+        elif el.tag == 'metadata':
+            metadata = {child.tag: child.text for child in el}
+
+    ndm_attrs = {f'@xmlns{":" + p if p else ""}': u for p, u in (root.nsmap or {}).items()}
+    ndm_attrs.update(_attrs(root))
+    skeleton = {'ndm': {**ndm_attrs,
+                        'oem': {**oem_attrs,
+                                'header': header,
+                                'body': {'segment': {'metadata': metadata,
+                                                     'data': {'COMMENT': comments,
+                                                              'stateVector': []}}}}}}
+    return (skeleton,
+            epochs,
+            np.asarray(xyz, dtype=np.float64),
+            np.asarray(vxyz, dtype=np.float64))
+
 def get_data() -> dict:
     '''
     Function fetches XML data from a URL and returns XML data as nested dictionaries. 
@@ -22,11 +142,153 @@ def get_data() -> dict:
     Returns:
         data (dict): Nested dictionaries of the OEM data.
     '''
-    global data
-    data.clear()
-    response = requests.get(url='https://nasa-public-data.s3.amazonaws.com/iss-coords/current/ISS_OEM/ISS.OEM_J2K_EPH.xml')
-    data = xmltodict.parse(response.text) # xmltodict.parse(response.content) works too
-    return data
+    global data, meta, EPOCHS, XYZ, VXYZ, EPOCH_TS, _EPOCH_INDEX, _OEM_JSON_BYTES
+    with _DATA_LOCK:
+        data.clear()
+        _OEM_JSON_BYTES = None
+
+        # The upstream OEM file changes infrequently, so ask S3 for its ETag first and
+        # reuse the parsed structure from the on-disk cache when the data is unchanged.
+        try:
+            etag = _SESSION.head(OEM_URL, timeout=10).headers.get('ETag')
+        except requests.RequestException:
+            etag = None
+
+        parsed = cache.get(('oem', OEM_CACHE_VERSION, etag)) if etag else None
+        if parsed is None:
+            # Stream the body straight into lxml's iterparse, which builds the SoA
+            # columns directly and frees each stateVector element as soon as its
+            # floats are extracted; peak memory stays flat as the OEM file grows
+            # and no intermediate per-stateVector dicts are ever allocated.
+            with _SESSION.get(url=OEM_URL, stream=True, timeout=(3, 15)) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                parsed = _parse_oem(response.raw)
+                etag = response.headers.get('ETag', etag)
+            if etag:
+                cache.set(('oem', OEM_CACHE_VERSION, etag), parsed, expire=86400)
+        skeleton, epochs, XYZ, VXYZ = parsed
+        data = skeleton
+
+        EPOCHS = epochs
+        EPOCH_TS = np.asarray([_parse_epoch(e) for e in epochs], dtype=np.float64)
+        _EPOCH_INDEX = {e: i for i, e in enumerate(epochs)}
+        _derive_quantities()
+
+        segment = data['ndm']['oem']['body']['segment']
+        meta = {'header': data['ndm']['oem']['header'],
+                'metadata': segment['metadata'],
+                'comment': segment['data']['COMMENT']}
+        return data
+
+@functools.lru_cache(maxsize=4096)
+def _reverse(lat_q: float, lon_q: float) -> str:
+    '''
+    Given a latitude/longitude pair quantized to two decimals (~1 km, plenty for a
+    country/ocean answer), function returns the geoposition string from Nominatim.
+    Lookups cost hundreds of ms and Nominatim rate-limits to ~1 req/sec, so results
+    are memoized in-process and persisted in the disk cache across restarts.
+    Args:
+        lat_q (float): Latitude rounded to two decimals.
+        lon_q (float): Longitude rounded to two decimals.
+    Returns:
+        result (str): Geoposition description, or a fallback for uninhabited areas.
+    '''
+    key = ('geo', lat_q, lon_q)
+    loc = cache.get(key)
+    if loc is not None:
+        return loc
+    geoloc = _geocoder.reverse((lat_q, lon_q), zoom=18, language='en')
+    try:
+        loc = [i for i in geoloc.raw.values()][7] # index 6 for only location or 7 for more info
+    except AttributeError:
+        loc = 'Unknown location, possibly somewhere over the ocean.'
+    cache.set(key, loc)
+    return loc
+
+def _parse_epoch(epoch: str) -> int:
+    '''
+    Given an epoch string in the fixed OEM format `YYYY-DDDTHH:MM:SS.sssZ`, function returns
+    the corresponding POSIX timestamp. Slicing the fixed positions and converting with int()
+    is much faster than time.strptime, which matters when parsing thousands of epochs per load.
+    Args:
+        epoch (str): An epoch string from the OEM data set.
+    Returns:
+        result (int): POSIX timestamp (UTC) for the epoch, ignoring fractional seconds.
+    '''
+    year = int(epoch[0:4])
+    day = int(epoch[5:8])
+    hour = int(epoch[9:11])
+    minute = int(epoch[12:14])
+    second = int(epoch[15:17])
+    # calendar.timegm reads tm_mday, not tm_yday, so pass the day of year as the
+    # day-of-month of January.
+    return calendar.timegm((year, 1, day, hour, minute, second, 0, 0, 0))
+
+# Each epoch's derived quantities are independent, so the rows are split across
+# every core with prange; cache=True persists the compiled kernel on disk.
+@njit(parallel=True, fastmath=True, cache=True)
+def _derive(xyz, vxyz, epoch_ts):
+    '''
+    Given the SoA position, velocity, and timestamp columns, function computes the
+    per-epoch speed, latitude, longitude (normalized), and altitude arrays.
+    Args:
+        xyz (np.ndarray): (N, 3) positions, in km.
+        vxyz (np.ndarray): (N, 3) velocities, in km/s.
+        epoch_ts (np.ndarray): N POSIX timestamps.
+    Returns:
+        result (tuple): (speed, lat, lon, alt) arrays of length N.
+    '''
+    n = xyz.shape[0]
+    speed = np.empty(n)
+    lat = np.empty(n)
+    lon = np.empty(n)
+    alt = np.empty(n)
+    for i in prange(n):
+        x, y, z = xyz[i, 0], xyz[i, 1], xyz[i, 2]
+        x_dot, y_dot, z_dot = vxyz[i, 0], vxyz[i, 1], vxyz[i, 2]
+        speed[i] = math.sqrt(x_dot*x_dot + y_dot*y_dot + z_dot*z_dot)
+        rho = math.hypot(x, y)
+        lat[i] = math.degrees(math.atan2(z, rho))
+        alt[i] = math.hypot(rho, z) - MEAN_EARTH_RADIUS
+        hrs = (epoch_ts[i] // 3600) % 24
+        mins = (epoch_ts[i] // 60) % 60
+        raw_lon = math.degrees(math.atan2(y, x)) - ((hrs-12)+(mins/60))*(360/24) + 14
+        lon[i] = ((raw_lon + 180.0) % 360.0) - 180.0
+    return speed, lat, lon, alt
+
+def _derive_quantities() -> None:
+    '''
+    Function computes the per-epoch speed, latitude, longitude, and altitude arrays from
+    the SoA columns in one parallel pass, so the speed and location routes reduce to an
+    indexed read instead of redoing the math on every request.
+    Args:
+        None
+    Returns:
+        None
+    '''
+    global SPEED, LAT, LON, ALT
+    SPEED, LAT, LON, ALT = _derive(XYZ, VXYZ, EPOCH_TS)
+
+def _state_vector(position: int) -> dict:
+    '''
+    Given a row number, function rebuilds the stateVector dictionary for that epoch in
+    the original xmltodict shape from the SoA columns. repr() of the parsed floats
+    round-trips, so the `#text` values match the source document.
+    Args:
+        position (int): Row number of the epoch in the SoA columns.
+    Returns:
+        result (dict): State vector in the same nested shape xmltodict produced.
+    '''
+    x, y, z = XYZ[position]
+    x_dot, y_dot, z_dot = VXYZ[position]
+    return {'EPOCH': EPOCHS[position],
+            'X': {'@units': 'km', '#text': repr(float(x))},
+            'Y': {'@units': 'km', '#text': repr(float(y))},
+            'Z': {'@units': 'km', '#text': repr(float(z))},
+            'X_DOT': {'@units': 'km/s', '#text': repr(float(x_dot))},
+            'Y_DOT': {'@units': 'km/s', '#text': repr(float(y_dot))},
+            'Z_DOT': {'@units': 'km/s', '#text': repr(float(z_dot))}}
 
 def get_config() -> dict:
     '''
@@ -44,42 +306,42 @@ def get_config() -> dict:
         # print(f"Couldn't load the config file; details: {e}")
         return default_config
 
-def correct_longtitude(num: float) -> float:
-    '''
-    Given a number, function returns corrected longtitude value.
-    Args:
-        num (float): A longtitude value.
-    Returns:
-        result (float): Corrected longtitude value.
-    '''
-    if num > 180:
-        return num - 360
-    elif num < -180:
-        return num + 360
-    else:
-        return num
-
 # ---------------------------- API routes ---------------------------------
 
 @app.route('/', methods=['GET'])
 def get_oem_data() -> dict:
     '''
-    Function reads data stored in the `data` global variable. Returns nested dictionaries. 
+    Function returns the OEM data as nested dictionaries, splicing state vectors rebuilt
+    from the SoA columns into the retained document skeleton. The serialized JSON bytes
+    are cached after the first hit, so repeat requests skip both the rebuild and the
+    re-encode until the data set changes.
     Args:
         None
     Returns:
         data (dict): Nested dictionaries of the OEM data.
     '''
-    if len(data) == 0:
-        return 'No data found. Please reload data.\n', 400
-    return data
+    global _OEM_JSON_BYTES
+    # The emptiness check, the rebuild, and the blob write must be atomic with
+    # respect to /delete-data and /post-data, which swap these globals under the
+    # same (reentrant) lock.
+    with _DATA_LOCK:
+        if len(data) == 0:
+            return 'No data found. Please reload data.\n', 400
+
+        if _OEM_JSON_BYTES is None:
+            segment = data['ndm']['oem']['body']['segment']
+            rebuilt_data = {**segment['data'], 'stateVector': [_state_vector(i) for i in range(len(EPOCHS))]}
+            document = {'ndm': {**data['ndm'],
+                                'oem': {**data['ndm']['oem'],
+                                        'body': {'segment': {**segment, 'data': rebuilt_data}}}}}
+            _OEM_JSON_BYTES = orjson.dumps(document, option=orjson.OPT_SERIALIZE_NUMPY)
+        return app.response_class(_OEM_JSON_BYTES, mimetype='application/json')
 
 
 @app.route('/epochs', methods=['GET'])
 def get_epochs() -> list:
     '''
-    Function fetches data stored in `data` global variable and iterates through the nested dictionary using a set of keys.
-    Returns a list of Epochs from the dataset.
+    Function returns the list of Epochs built when the data set was loaded.
     Args:
         none
     Returns:
@@ -88,10 +350,8 @@ def get_epochs() -> list:
     '''
     if len(data) == 0:
         return 'No data found. Please reload data.\n', 400
-    
-    epochs = []
-    for i in data['ndm']['oem']['body']['segment']['data']['stateVector']:
-        epochs.append(i['EPOCH'])
+
+    epochs = EPOCHS
 
     # implementing /epochs?limit=int&offset=int
     try:
@@ -125,22 +385,18 @@ def get_state_vectors(epoch: str) -> dict:
     '''
     if len(data) == 0:
         return 'No data found. Please reload data.\n', 400
-    elif epoch not in get_epochs():
+
+    position = _EPOCH_INDEX.get(epoch)
+    if position is None:
         return 'The epoch you requested is not in the data.\n', 400
-    else:
-        for i in data['ndm']['oem']['body']['segment']['data']['stateVector']:
-            if i['EPOCH'] == epoch:
-                return i
-            else:
-                continue
+    return _state_vector(position)
 
 
 @app.route('/epochs/<epoch>/speed', methods=['GET'])
 def calculate_speed(epoch: str) -> dict:
     '''
-    Given a string, this function calls the `get_state_vectors()` function to retrieve the state vector (dict) for a given epoch.
-    Iterates through the dictionary, pulling out values associated with a given key.
-    Returns instantaneous speed for a specific epoch in the data set.
+    Given a string, this function looks up the velocity components for the requested epoch
+    in the pre-built arrays and returns the instantaneous speed for that epoch.
     Args:
         epoch (str): A specific Epoch in the data set, requested by user.
     Returns:
@@ -149,17 +405,12 @@ def calculate_speed(epoch: str) -> dict:
     '''
     if len(data) == 0:
         return 'No data found. Please reload data.\n', 400
-    state_vec = get_state_vectors(epoch)
 
-    try:
-        x_dot = float(state_vec['X_DOT']['#text'])
-        y_dot = float(state_vec['Y_DOT']['#text'])
-        z_dot = float(state_vec['Z_DOT']['#text'])
-    except TypeError:
+    position = _EPOCH_INDEX.get(epoch)
+    if position is None:
         return 'We are unable to calculate speed. Invalid Epoch.\n', 400
 
-    speed = math.sqrt( (x_dot**2) + (y_dot**2) + (z_dot**2) )
-    return {"value": speed, "units": "km/s"}
+    return {"value": float(SPEED[position]), "units": "km/s"}
 
 
 @app.route('/help', methods=['GET'])
@@ -203,12 +454,24 @@ def delete_data() -> str:
     Returns:
         result (str): String confirming deletion of data.
     '''
-    global data
-    if len(data) == 0:
-        return 'No data to delete.\n', 400
-    
-    data.clear()
-    return 'All the data has been removed.\n'
+    global data, meta, EPOCHS, XYZ, VXYZ, EPOCH_TS, SPEED, LAT, LON, ALT, _EPOCH_INDEX, _OEM_JSON_BYTES
+    with _DATA_LOCK:
+        if len(data) == 0:
+            return 'No data to delete.\n', 400
+
+        data.clear()
+        _OEM_JSON_BYTES = None
+        meta = {}
+        EPOCHS = []
+        XYZ = np.empty((0, 3))
+        VXYZ = np.empty((0, 3))
+        EPOCH_TS = np.empty(0)
+        SPEED = np.empty(0)
+        LAT = np.empty(0)
+        LON = np.empty(0)
+        ALT = np.empty(0)
+        _EPOCH_INDEX = {}
+        return 'All the data has been removed.\n'
 
 
 @app.route('/post-data', methods=['POST'])
@@ -220,9 +483,8 @@ def post_data() -> dict:
     Returns:
         data (dict): Nested dictionaries of the OEM data.
     '''
-    global data
     get_data()
-    return data
+    return get_oem_data()
 
 
 @app.route('/comment', methods=['GET'])
@@ -235,7 +497,7 @@ def get_comment() -> list:
         result (list): A list containing `comment` information.
     '''
     try:
-        return data['ndm']['oem']['body']['segment']['data']['COMMENT']
+        return meta['comment']
     except KeyError:
         return 'No data found. Please reload data.\n', 400
 
@@ -250,7 +512,7 @@ def get_header() -> dict:
         result (dict): A list containing `header` information.
     '''
     try:
-        return data['ndm']['oem']['header']
+        return meta['header']
     except KeyError:
         return 'No data found. Please reload data.\n', 400
 
@@ -265,7 +527,7 @@ def get_metadata() -> dict:
         result (dict): A dictionary containing `metadata` information.
     '''
     try:
-        return data['ndm']['oem']['body']['segment']['metadata']
+        return meta['metadata']
     except KeyError:
         return 'No data found. Please reload data.\n', 400
 
@@ -273,8 +535,8 @@ def get_metadata() -> dict:
 @app.route('/epochs/<epoch>/location', methods=['GET'])
 def get_location(epoch: str) -> dict:
     '''
-    Given a string, this function calls the `get_state_vectors()` function to retrieve the state vector (dict) for a given epoch.
-    Iterates through the dictionary, pulling out values associated with a given key.
+    Given a string, this function looks up the position components for the requested epoch
+    in the pre-built arrays.
     Returns a dictionary containing latitude, longitude, altitude, and geoposition for given Epoch in the data set.
     Args:
         epoch (str): A specific Epoch in the data set, requested by user.
@@ -283,34 +545,16 @@ def get_location(epoch: str) -> dict:
     '''
     if len(data) == 0:
         return 'No data found. Please reload data.\n', 400
-    
-    state_vec = get_state_vectors(epoch)
-    try:
-        epoch = state_vec['EPOCH']
-        x = float(state_vec['X']['#text'])
-        y = float(state_vec['Y']['#text'])
-        z = float(state_vec['Z']['#text'])
-    except Exception:
-        return 'Bad request. Invalid Epoch.\n', 400
 
-    time_epoch = time.mktime(time.strptime(epoch[:-5], '%Y-%jT%H:%M:%S'))
-    utc_time = time.gmtime(time_epoch)
-    hrs = utc_time.tm_hour
-    mins = utc_time.tm_min
-
-    lat = math.degrees(math.atan2(z, math.sqrt(x**2 + y**2)))
-    lon = math.degrees(math.atan2(y, x)) - ((hrs-12)+(mins/60))*(360/24) + 14
-    alt = math.sqrt(x**2 + y**2 + z**2) - MEAN_EARTH_RADIUS
+    position = _EPOCH_INDEX.get(epoch)
+    if position is None:
+        return 'Bad request. Invalid Epoch.\n', 400
+    lat = float(LAT[position])
+    lon = float(LON[position])
+    alt = float(ALT[position])
 
-    lon = correct_longtitude(lon)
+    loc = _reverse(round(lat, 2), round(lon, 2))
 
-    geocoder = Nominatim(user_agent='iss_tracker')
-    geoloc = geocoder.reverse((lat, lon), zoom=18, language='en')
-    try:
-        loc = [i for i in geoloc.raw.values()][7] # index 6 for only location or 7 for more info
-    except AttributeError:
-        loc = 'Unknown location, possibly somewhere over the ocean.'
-    
     location = {"latitude": lat, "longtitude": lon, "altitude": {"value": alt, "units": "km"}, "geo": loc}
     return location
 
@@ -318,24 +562,13 @@ def get_location(epoch: str) -> dict:
 def location_now() -> dict:
     if len(data) == 0:
         return 'No data found. Please reload data.\n', 400
-    
-    epochs = get_epochs()
-    if type(epochs) != list:
-        return 'No data.\n', 400    
-    
-    time_now = time.time()
-    time_diff = []
-    for e in epochs:
-        time_epoch = time.mktime(time.strptime(e[:-5], '%Y-%jT%H:%M:%S'))
-        difference = time_now - time_epoch
-        time_diff.append(difference)
 
-    abs_diff = min(time_diff, key=abs)
-    position = time_diff.index(abs_diff)
-    closest_epoch = epochs[position]
-
-    time_format = time.mktime(time.strptime(closest_epoch[:-5], '%Y-%jT%H:%M:%S'))
-    epoch_time = time.gmtime(time_format)
+    time_now = time.time()
+    # One vectorized sweep over the pre-parsed timestamps instead of a Python
+    # loop that re-parses every epoch string per request.
+    position = int(np.argmin(np.abs(EPOCH_TS - time_now)))
+    abs_diff = time_now - float(EPOCH_TS[position])
+    closest_epoch = EPOCHS[position]
 
     location_now = {"closest_epoch": closest_epoch,\
                     "seconds_from_now": abs_diff,\
@@ -346,9 +579,19 @@ def location_now() -> dict:
 
 if __name__ == '__main__':
     data = get_data()
-    
+
     config = get_config()
     if config.get('debug', True):
         app.run(debug=True, host='0.0.0.0')
     else:
         app.run(host='0.0.0.0')
+else:
+    # gunicorn (and any other WSGI server) imports the module without running the
+    # __main__ block, so preload the data set here to keep the documented
+    # "start the container, then GET /" flow working. A failed fetch is not fatal:
+    # the data can still be loaded later via /post-data.
+    try:
+        get_data()
+    except Exception as e:
+        # print(f"Couldn't preload the OEM data; details: {e}")
+        pass